@@ -0,0 +1,319 @@
+# edit_history.py
+"""
+Кэш результатов инпейнтинга и история правок.
+Основные возможности модуля:
+1. Хранение результатов Simple LaMa в виде дельт: сохраняются только изменённые области страницы.
+2. Кэш дельт с ключом (хэш страницы, хэш маски) и ограничением по памяти и по диску.
+3. История правок (undo/redo), которая хранит сжатые маски вместо целых страниц.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def hash_array(arr):
+    """
+    Вычисляет хэш массива numpy с учетом его формы и типа данных.
+
+    :param arr: массив numpy (изображение или маска)
+    :return: шестнадцатеричная строка хэша
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{arr.shape}{arr.dtype}".encode())
+    digest.update(np.ascontiguousarray(arr).data)
+    return digest.hexdigest()
+
+
+class Delta:
+    """
+    Разница между исходной страницей и результатом инпейнтинга.
+    Хранит только прямоугольники изменённых областей, сжатые zlib.
+    """
+
+    def __init__(self, shape, dtype, boxes, payload):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.payload = payload
+
+    @property
+    def nbytes(self):
+        """
+        Возвращает примерный объем памяти, занимаемый дельтой.
+        """
+        return len(self.payload) + 16 * len(self.boxes)
+
+    def apply(self, original):
+        """
+        Восстанавливает результат инпейнтинга по исходной странице.
+
+        :param original: массив исходного изображения
+        :return: новый массив с применёнными изменениями
+        """
+        if original.shape != self.shape:
+            raise ValueError(f"Размер страницы {original.shape} не совпадает с размером дельты {self.shape}")
+        result = original.copy()
+        raw = zlib.decompress(self.payload)
+        channels = self.shape[2:]
+        offset = 0
+        for x, y, w, h in self.boxes:
+            size = h * w * int(np.prod(channels, dtype=np.int64)) * self.dtype.itemsize
+            patch = np.frombuffer(raw, dtype=self.dtype, count=size // self.dtype.itemsize, offset=offset)
+            result[y:y + h, x:x + w] = patch.reshape((h, w) + channels)
+            offset += size
+        return result
+
+    def save(self, path):
+        """
+        Сохраняет дельту на диск.
+
+        :param path: путь к файлу .npz
+        """
+        np.savez(path, shape=np.array(self.shape), dtype=np.array(self.dtype.str),
+                 boxes=np.array(self.boxes, dtype=np.int64).reshape(-1, 4),
+                 payload=np.frombuffer(self.payload, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Загружает дельту с диска.
+
+        :param path: путь к файлу .npz
+        :return: объект Delta
+        """
+        with np.load(path) as data:
+            return cls(data["shape"].tolist(), str(data["dtype"]), data["boxes"].tolist(),
+                       data["payload"].tobytes())
+
+
+def make_delta(original, result, mask=None):
+    """
+    Строит дельту между исходной страницей и результатом инпейнтинга.
+    Изменённые пиксели группируются в связные области, для каждой сохраняется ограничивающий прямоугольник.
+
+    :param original: массив исходного изображения
+    :param result: массив результата инпейнтинга того же размера
+    :param mask: маска инпейнтинга; если задана, изменения вне маски не сохраняются
+    :return: объект Delta
+    """
+    if original.shape != result.shape:
+        raise ValueError(f"Размеры изображений не совпадают: {original.shape} и {result.shape}")
+
+    changed = original != result
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+    if mask is not None:
+        changed &= mask > 0
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(changed.astype(np.uint8), connectivity=8)
+    # Первая компонента - фон, её пропускаем
+    boxes = [tuple(stat[:4]) for stat in stats[1:]]
+    patches = [np.ascontiguousarray(result[y:y + h, x:x + w]).tobytes() for x, y, w, h in boxes]
+    return Delta(original.shape, original.dtype, boxes, zlib.compress(b"".join(patches), 1))
+
+
+class InpaintCache:
+    """
+    Кэш результатов инпейнтинга с ключом (хэш страницы, хэш маски).
+    Дельты сначала хранятся в памяти; при превышении лимита памяти самые старые
+    переносятся на диск, а при превышении лимита диска удаляются.
+    """
+
+    def __init__(self, memory_budget=256 * 1024 * 1024, disk_budget=1024 * 1024 * 1024, cache_dir=None):
+        """
+        :param memory_budget: максимальный объем дельт в памяти (в байтах)
+        :param disk_budget: максимальный объем дельт на диске (в байтах)
+        :param cache_dir: папка для дельт на диске; None - только память
+        """
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._page_hashes = {}
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".npz")]
+            for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+                key = tuple(entry.name[:-len(".npz")].split("_", 1))
+                self._disk[key] = entry.stat().st_size
+                self._disk_size += entry.stat().st_size
+            self._trim_disk()
+
+    def page_hash(self, filepath, img_np):
+        """
+        Возвращает хэш страницы, запоминая его для файла, пока тот не изменился.
+
+        :param filepath: путь к исходному изображению
+        :param img_np: массив исходного изображения
+        :return: хэш страницы
+        """
+        stat = os.stat(filepath)
+        file_key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._page_hashes.get(file_key)
+        if cached is None:
+            cached = hash_array(img_np)
+            with self._lock:
+                self._page_hashes[file_key] = cached
+        return cached
+
+    def get(self, key):
+        """
+        Возвращает дельту по ключу или None, если результата нет в кэше.
+
+        :param key: кортеж (хэш страницы, хэш маски)
+        :return: объект Delta или None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key not in self._disk:
+                return None
+            path = self._disk_path(key)
+            try:
+                delta = Delta.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Не удалось прочитать дельту {path}: {e}")
+                self._forget_disk(key)
+                return None
+            self._forget_disk(key)
+            self._put_memory(key, delta)
+            return delta
+
+    def put(self, key, delta):
+        """
+        Добавляет дельту в кэш.
+
+        :param key: кортеж (хэш страницы, хэш маски)
+        :param delta: объект Delta
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= self._memory.pop(key).nbytes
+            self._forget_disk(key)
+            self._put_memory(key, delta)
+
+    def _put_memory(self, key, delta):
+        self._memory[key] = delta
+        self._memory_size += delta.nbytes
+        while self._memory_size > self.memory_budget and len(self._memory) > 1:
+            old_key, old_delta = self._memory.popitem(last=False)
+            self._memory_size -= old_delta.nbytes
+            self._spill(old_key, old_delta)
+
+    def _spill(self, key, delta):
+        if not self.cache_dir or delta.nbytes > self.disk_budget:
+            return
+        path = self._disk_path(key)
+        try:
+            delta.save(path)
+        except OSError as e:
+            print(f"Не удалось сохранить дельту {path}: {e}")
+            return
+        size = os.path.getsize(path)
+        self._disk[key] = size
+        self._disk_size += size
+        self._trim_disk()
+
+    def _trim_disk(self):
+        while self._disk_size > self.disk_budget and self._disk:
+            self._forget_disk(next(iter(self._disk)))
+
+    def _forget_disk(self, key):
+        size = self._disk.pop(key, None)
+        if size is None:
+            return
+        self._disk_size -= size
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key[0]}_{key[1]}.npz")
+
+
+class EditHistory:
+    """
+    История правок страницы для отмены и повтора удаления масок.
+    Каждая запись хранит только сжатую маску; пиксели результата берутся из InpaintCache.
+    Нулевая запись (None) соответствует странице до удаления масок.
+    """
+
+    def __init__(self, max_entries=50):
+        """
+        :param max_entries: максимальное количество записей в истории
+        """
+        self.max_entries = max_entries
+        self.reset()
+
+    def reset(self):
+        """
+        Очищает историю, например, при загрузке новой страницы.
+        """
+        self._entries = [None]
+        self._index = 0
+
+    def push(self, mask):
+        """
+        Добавляет в историю новое удаление масок. Записи для повтора отбрасываются.
+        Повторное удаление с той же маской, что и в текущей записи, не добавляет новую запись.
+
+        :param mask: комбинированная маска, переданная в инпейнтинг
+        :return: True, если запись добавлена
+        """
+        mask_hash = hash_array(mask)
+        current = self._entries[self._index]
+        if current is not None and current[2] == mask_hash:
+            return False
+        del self._entries[self._index + 1:]
+        self._entries.append((mask.shape, zlib.compress(np.ascontiguousarray(mask).tobytes(), 1), mask_hash))
+        if len(self._entries) > self.max_entries:
+            del self._entries[0]
+        self._index = len(self._entries) - 1
+        return True
+
+    def can_undo(self):
+        return self._index > 0
+
+    def can_redo(self):
+        return self._index < len(self._entries) - 1
+
+    def undo(self):
+        """
+        Переходит на предыдущую запись истории.
+
+        :return: маска предыдущего состояния или None для страницы до удаления масок
+        """
+        if self.can_undo():
+            self._index -= 1
+        return self._current_mask()
+
+    def redo(self):
+        """
+        Переходит на следующую запись истории.
+
+        :return: маска следующего состояния
+        """
+        if self.can_redo():
+            self._index += 1
+        return self._current_mask()
+
+    def _current_mask(self):
+        entry = self._entries[self._index]
+        if entry is None:
+            return None
+        shape, payload, _ = entry
+        return np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(shape).copy()
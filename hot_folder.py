@@ -0,0 +1,334 @@
+# hot_folder.py
+"""
+Эта программа следит за папкой и автоматически обрабатывает новые и изменённые страницы.
+Основные функции программы включают:
+1. Периодический просмотр папки и ожидание, пока файл не перестанет меняться (защита от недописанных файлов).
+2. Детекция текста и звуков и удаление масок с помощью Simple LaMa с ограниченным числом параллельных задач.
+3. Сохранение результатов рядом с исходными файлами и ведение манифеста manifest.json.
+4. Статистика: длина очередей и время выполнения каждого этапа.
+
+Запуск: python hot_folder.py <папка>
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+MASKS_SUFFIX = ".masks.png"
+INPAINTED_SUFFIX = ".inpainted.png"
+MANIFEST_NAME = "manifest.json"
+
+
+class StageStats:
+    """
+    Накопительная статистика времени выполнения одного этапа обработки.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """
+        Добавляет очередное измерение.
+
+        :param seconds: время выполнения этапа в секундах
+        """
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "last": round(self.last, 3),
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+        }
+
+
+def default_pipeline(options=("text", "sound"), text_padding=10, sound_padding=10):
+    """
+    Создает функции детекции и инпейнтинга на основе image_processing.
+    Модели загружаются при первом вызове, а не при импорте модуля.
+
+    :param options: какие маски применять (text, sound)
+    :param text_padding: количество пикселей для расширения области маски текста
+    :param sound_padding: количество пикселей для расширения области маски звука
+    :return: функция детекции, функция инпейнтинга
+    """
+    from image_processing import apply_masks, generate_initial_masks, remove_mask_with_lama
+
+    def detect(image_path, masks_path):
+        mask_sound, mask_text = generate_initial_masks(image_path)
+        _, combined_mask = apply_masks(image_path, list(options), text_padding, sound_padding,
+                                       mask_sound, mask_text, image_with_masks_path=masks_path)
+        return combined_mask
+
+    def inpaint(image_path, combined_mask, result_path):
+        # Кэш не используется: в папке страницы почти никогда не обрабатываются повторно с той же маской
+        return remove_mask_with_lama(image_path, combined_mask, result_path=result_path)
+
+    return detect, inpaint
+
+
+class HotFolder:
+    """
+    Обработчик папки: находит новые страницы, пропускает их через детекцию и инпейнтинг
+    и записывает результаты и манифест рядом с исходными файлами.
+
+    Функции detect(image_path, masks_path) -> маска и inpaint(image_path, маска, result_path) -> путь
+    можно передать явно, например, для проверки на временной папке без загрузки моделей.
+    """
+
+    def __init__(self, folder, detect=None, inpaint=None, poll_interval=1.0, settle_time=2.0,
+                 queue_size=4, detect_workers=1, inpaint_workers=1):
+        """
+        :param folder: папка, за которой нужно следить
+        :param detect: функция детекции; по умолчанию из image_processing
+        :param inpaint: функция инпейнтинга; по умолчанию из image_processing
+        :param poll_interval: интервал между просмотрами папки (в секундах)
+        :param settle_time: сколько секунд файл должен оставаться неизменным перед обработкой
+        :param queue_size: максимальная длина каждой очереди; при заполнении просмотр папки ждет
+        :param detect_workers: количество параллельных задач детекции; для детекции по умолчанию всегда 1,
+            так как модели YOLO из image_processing нельзя использовать из нескольких потоков
+        :param inpaint_workers: количество параллельных задач инпейнтинга
+        """
+        if detect is None or inpaint is None:
+            default_detect, default_inpaint = default_pipeline()
+            if detect is None and detect_workers > 1:
+                print("Детекция по умолчанию использует общие модели YOLO, количество задач детекции уменьшено до 1")
+                detect_workers = 1
+            detect = detect or default_detect
+            inpaint = inpaint or default_inpaint
+        self.folder = folder
+        self.detect = detect
+        self.inpaint = inpaint
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.queue_size = queue_size
+        self.detect_workers = detect_workers
+        self.inpaint_workers = inpaint_workers
+
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        self.stats = {stage: StageStats() for stage in ("queue", "detect", "inpaint", "total")}
+        self._pending = {}
+        self._in_flight = set()
+        self._detect_queue = None
+        self._inpaint_queue = None
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f).get("pages", {})
+        except (OSError, ValueError) as e:
+            if os.path.exists(self.manifest_path):
+                print(f"Не удалось прочитать манифест {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self):
+        # Ошибка записи манифеста не должна останавливать обработчики очередей
+        data = {"pages": self.manifest, "stats": self.get_stats()}
+        tmp_path = self.manifest_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"Не удалось сохранить манифест {self.manifest_path}: {e}")
+
+    def get_stats(self):
+        """
+        Возвращает длину очередей и статистику времени выполнения этапов.
+        """
+        return {
+            "pending": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "detect_queue": self._detect_queue.qsize() if self._detect_queue else 0,
+            "inpaint_queue": self._inpaint_queue.qsize() if self._inpaint_queue else 0,
+            "latency": {stage: stats.as_dict() for stage, stats in self.stats.items()},
+        }
+
+    def _is_source_image(self, name):
+        lower = name.lower()
+        if lower.endswith(MASKS_SUFFIX) or lower.endswith(INPAINTED_SUFFIX):
+            return False
+        return lower.endswith(IMAGE_EXTENSIONS)
+
+    async def scan_once(self):
+        """
+        Просматривает папку один раз и ставит в очередь файлы, которые перестали меняться.
+
+        :return: количество файлов, поставленных в очередь
+        """
+        now = time.monotonic()
+        seen = set()
+        ready = []
+        for entry in os.scandir(self.folder):
+            if not self._is_source_image(entry.name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                # Файл удален или переименован после получения списка папки
+                continue
+            name = entry.name
+            seen.add(name)
+            signature = [stat.st_size, stat.st_mtime_ns]
+            if name in self._in_flight or self.manifest.get(name, {}).get("signature") == signature:
+                continue
+            pending = self._pending.get(name)
+            if pending is None or pending[0] != signature:
+                # Файл новый или еще записывается: отсчет начинается заново
+                self._pending[name] = (signature, now)
+            elif now - pending[1] >= self.settle_time:
+                ready.append((name, signature))
+
+        # Файлы, удаленные до окончания ожидания, больше не отслеживаются
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]
+
+        for name, signature in ready:
+            del self._pending[name]
+            self._in_flight.add(name)
+            # При заполненной очереди просмотр папки ждет освобождения места
+            await self._detect_queue.put((name, signature, time.monotonic()))
+        return len(ready)
+
+    async def _detect_worker(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            name, signature, queued_at = await self._detect_queue.get()
+            try:
+                started = time.monotonic()
+                self.stats["queue"].add(started - queued_at)
+                image_path = os.path.join(self.folder, name)
+                masks_path = self._output_path(name, MASKS_SUFFIX)
+                combined_mask = await loop.run_in_executor(executor, self.detect, image_path, masks_path)
+                record = {"signature": signature, "masks": os.path.basename(masks_path),
+                          "detect_seconds": round(time.monotonic() - started, 3)}
+                self.stats["detect"].add(record["detect_seconds"])
+                await self._inpaint_queue.put((name, combined_mask, record, queued_at))
+            except Exception as e:
+                self._finish(name, {"signature": signature, "status": "error", "error": str(e)}, queued_at)
+            finally:
+                self._detect_queue.task_done()
+
+    async def _inpaint_worker(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            name, combined_mask, record, queued_at = await self._inpaint_queue.get()
+            try:
+                started = time.monotonic()
+                if combined_mask is not None and combined_mask.any():
+                    image_path = os.path.join(self.folder, name)
+                    result_path = self._output_path(name, INPAINTED_SUFFIX)
+                    result_path = await loop.run_in_executor(executor, self.inpaint, image_path,
+                                                             combined_mask, result_path)
+                    record["inpainted"] = os.path.basename(result_path) if result_path else None
+                else:
+                    # Масок не найдено, запускать LaMa не нужно
+                    record["inpainted"] = None
+                record["inpaint_seconds"] = round(time.monotonic() - started, 3)
+                self.stats["inpaint"].add(record["inpaint_seconds"])
+                record["status"] = "done"
+                self._finish(name, record, queued_at)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+                self._finish(name, record, queued_at)
+            finally:
+                self._inpaint_queue.task_done()
+
+    def _output_path(self, name, suffix):
+        # Имя исходного файла сохраняется целиком, чтобы page.jpg и page.png не перезаписывали результаты друг друга
+        return os.path.join(self.folder, name + suffix)
+
+    def _finish(self, name, record, queued_at):
+        record["processed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.stats["total"].add(time.monotonic() - queued_at)
+        self.manifest[name] = record
+        self._in_flight.discard(name)
+        self._save_manifest()
+        if record["status"] == "done":
+            print(f"Страница {name} обработана, в очереди: {self._detect_queue.qsize() + self._inpaint_queue.qsize()}")
+        else:
+            print(f"Ошибка при обработке страницы {name}: {record['error']}")
+
+    async def drain(self):
+        """
+        Ожидает, пока все поставленные в очередь страницы будут обработаны.
+        """
+        await self._detect_queue.join()
+        await self._inpaint_queue.join()
+
+    async def run(self, stop_event=None):
+        """
+        Следит за папкой, пока не будет установлен stop_event (или бесконечно).
+
+        :param stop_event: asyncio.Event для остановки обработчика
+        """
+        self._detect_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._inpaint_queue = asyncio.Queue(maxsize=self.queue_size)
+        detect_executor = ThreadPoolExecutor(max_workers=self.detect_workers)
+        inpaint_executor = ThreadPoolExecutor(max_workers=self.inpaint_workers)
+        workers = [asyncio.create_task(self._detect_worker(detect_executor))
+                   for _ in range(self.detect_workers)]
+        workers += [asyncio.create_task(self._inpaint_worker(inpaint_executor))
+                    for _ in range(self.inpaint_workers)]
+        print(f"Наблюдение за папкой {self.folder}")
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    await self.scan_once()
+                except OSError as e:
+                    # Папка временно недоступна (например, сетевой диск): повтор при следующем просмотре
+                    print(f"Не удалось просмотреть папку {self.folder}: {e}")
+                if stop_event is None:
+                    await asyncio.sleep(self.poll_interval)
+                else:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+            await self.drain()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            detect_executor.shutdown(wait=True)
+            inpaint_executor.shutdown(wait=True)
+            print("Наблюдение за папкой остановлено")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Автоматическая обработка страниц в папке")
+    parser.add_argument("folder", help="папка, за которой нужно следить")
+    parser.add_argument("--interval", type=float, default=1.0, help="интервал просмотра папки в секундах")
+    parser.add_argument("--settle", type=float, default=2.0, help="время неизменности файла перед обработкой")
+    parser.add_argument("--queue-size", type=int, default=4, help="максимальная длина очередей")
+    parser.add_argument("--detect-workers", type=int, default=1, help="параллельные задачи детекции (для моделей YOLO всегда 1)")
+    parser.add_argument("--inpaint-workers", type=int, default=1, help="параллельные задачи инпейнтинга")
+    args = parser.parse_args()
+
+    hot_folder = HotFolder(args.folder, poll_interval=args.interval, settle_time=args.settle,
+                           queue_size=args.queue_size, detect_workers=args.detect_workers,
+                           inpaint_workers=args.inpaint_workers)
+    try:
+        asyncio.run(hot_folder.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# image_preview.py
+"""
+Загрузка уменьшенных копий изображений для предпросмотра.
+Модуль не загружает модели, поэтому его можно использовать и проверять отдельно от image_processing.
+"""
+
+from PIL import Image
+
+
+def load_preview_image(image_path, max_size):
+    """
+    Загружает уменьшенную копию изображения для предпросмотра.
+    Для JPEG декодирование сразу выполняется в уменьшенном разрешении (масштабирование DCT),
+    поэтому время загрузки почти не зависит от размера страницы.
+    PNG и другие форматы не поддерживают уменьшенное декодирование: файл декодируется целиком
+    и затем уменьшается через Image.reduce, поэтому время растет с размером страницы
+    и функцию следует вызывать не из главного потока интерфейса.
+
+    :param image_path: путь к изображению
+    :param max_size: максимальный размер копии (ширина, высота)
+    :return: уменьшенное изображение, размер исходного изображения
+    """
+    img = Image.open(image_path)
+    full_size = img.size
+    max_size = (max(1, max_size[0]), max(1, max_size[1]))
+
+    # Для JPEG декодирование сразу выполняется в уменьшенном разрешении
+    img.draft(None, max_size)
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("RGB")
+    factor = min(img.width // max_size[0], img.height // max_size[1])
+    if factor > 1:
+        img = img.reduce(factor)
+    img.thumbnail(max_size)
+    print(f"Загружен предпросмотр {img.width}x{img.height} для изображения {full_size[0]}x{full_size[1]}")
+    return img, full_size
@@ -5,6 +5,7 @@
 1. Генерация начальных масок для текста и звука на изображении.
 2. Применение масок с возможностью расширения области маски.
 3. Удаление областей масок с изображений с использованием метода inpainting Simple LaMa.
+4. Повторное использование ранее вычисленных результатов inpainting через кэш дельт.
 """
 
 import cv2
@@ -12,13 +13,15 @@ import numpy as np
 from PIL import Image
 from ultralytics import YOLO
 from simple_lama_inpainting import SimpleLama
+from edit_history import hash_array, make_delta
 
 # Загрузка предобученных моделей YOLOv8 для текста и сегментации
 model_text = YOLO("best.pt") # Модель для детекции текста
 model_segmentation = YOLO('Sbest.pt') # Модель для детекции звуков
 simple_lama = SimpleLama()
 
-def apply_masks(image_path, options, text_padding, sound_padding, mask_sound, mask_text):
+def apply_masks(image_path, options, text_padding, sound_padding, mask_sound, mask_text,
+                image_with_masks_path="image_with_masks.png"):
     """
     Применяет маски текста и звука к изображению с учетом заданных параметров расширения масок.
 
@@ -28,6 +31,7 @@ def apply_masks(image_path, options, text_padding, sound_padding, mask_sound, ma
     :param sound_padding: количество пикселей для расширения области маски звука
     :param mask_sound: маска звука
     :param mask_text: маска текста
+    :param image_with_masks_path: путь для сохранения изображения с наложенными масками
     :return: путь к изображению с наложенными масками, комбинированная маска
     """
     # Чтение изображения
@@ -64,30 +68,66 @@ def apply_masks(image_path, options, text_padding, sound_padding, mask_sound, ma
     print("Красные маски наложены на изображение")
 
     # Сохранение изображения с наложенными масками
-    image_with_masks_path = "image_with_masks.png"
     cv2.imwrite(image_with_masks_path, img_with_masks)
     print(f"Изображение с масками сохранено в {image_with_masks_path}")
 
     return image_with_masks_path, combined_mask_global
 
-def remove_mask_with_lama(filepath, combined_mask):
+def inpaint_with_lama(img_np, combined_mask, cache=None, page_hash=None):
+    """
+    Удаляет области масок с уже декодированного изображения с использованием Simple LaMa.
+    Вне маски результат всегда совпадает с исходной страницей.
+    Если переданы кэш и хэш страницы, результат для той же маски восстанавливается без запуска LaMa.
+
+    :param img_np: массив исходного изображения в формате RGB
+    :param combined_mask: комбинированная маска текста и звука
+    :param cache: кэш результатов инпейнтинга (InpaintCache) или None
+    :param page_hash: хэш исходной страницы для ключа кэша
+    :return: изображение PIL после инпейнтинга
+    """
+    # Поиск готового результата в кэше
+    key = None
+    if cache is not None and page_hash is not None:
+        key = (page_hash, hash_array(combined_mask))
+        delta = cache.get(key)
+        if delta is not None:
+            print("Результат инпейнтинга взят из кэша")
+            return Image.fromarray(delta.apply(img_np))
+
+    # Применение Simple LaMa для удаления масок
+    result = simple_lama(Image.fromarray(img_np), Image.fromarray(combined_mask))
+    result_np = np.array(result.convert('RGB'))
+    # SimpleLama дополняет изображение до размера, кратного 8, поэтому результат обрезается до исходного
+    h, w = img_np.shape[:2]
+    if result_np.shape[0] >= h and result_np.shape[1] >= w:
+        # Вне маски всегда остается исходная страница, с кэшем и без него
+        inside = combined_mask > 0
+        composed = img_np.copy()
+        composed[inside] = result_np[:h, :w][inside]
+        result = Image.fromarray(composed)
+        if key is not None:
+            cache.put(key, make_delta(img_np, composed, combined_mask))
+    else:
+        print("Размер результата меньше исходного, результат не совмещается с маской и не кэшируется")
+    return result
+
+def remove_mask_with_lama(filepath, combined_mask, cache=None, result_path="inpainted.png"):
     """
     Удаляет области масок с изображения с использованием метода inpainting от Simple LaMa.
+    Если передан кэш, результат для той же пары (страница, маска) восстанавливается без запуска LaMa.
 
     :param filepath: путь к изображению с наложенными масками
     :param combined_mask: комбинированная маска текста и звука
+    :param cache: кэш результатов инпейнтинга (InpaintCache) или None
+    :param result_path: путь для сохранения результата инпейнтинга
     :return: путь к изображению после инпейнтинга
     """
     print("Начало удаления масок с помощью LaMa")
     if filepath and combined_mask is not None:
-        # Открытие изображения и преобразование маски в формат PIL
-        img = Image.open(filepath).convert('RGB')
-        img_np = np.array(img)
-        combined_mask_pil = Image.fromarray(combined_mask)
-
-        # Применение Simple LaMa для удаления масок
-        result = simple_lama(img, combined_mask_pil)
-        result_path = "inpainted.png"
+        # Открытие изображения и преобразование в массив
+        img_np = np.array(Image.open(filepath).convert('RGB'))
+        page_hash = cache.page_hash(filepath, img_np) if cache is not None else None
+        result = inpaint_with_lama(img_np, combined_mask, cache=cache, page_hash=page_hash)
         result.save(result_path)
         print(f"Результат инпейнтинга сохранен в {result_path}")
         return result_path
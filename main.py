@@ -4,13 +4,17 @@
 1. Загрузка изображения и генерация начальных масок для текста и звука.
 2. Применение масок к изображению с возможностью расширения областей масок.
 3. Удаление областей масок с изображений с использованием метода inpainting от Simple LaMa.
+4. Отмена и повтор удаления масок с кэшированием результатов inpainting.
 """
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk, ImageFilter
 import threading
-from image_processing import apply_masks, generate_initial_masks, remove_mask_with_lama
+import numpy as np
+from image_processing import apply_masks, generate_initial_masks, inpaint_with_lama
+from image_preview import load_preview_image
+from edit_history import EditHistory, InpaintCache
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
@@ -31,6 +35,15 @@ img_preview_path = None
 original_img = None
 is_processing = False
 
+# Результат inpainting в памяти; в файл img_preview_path он записывается только при сохранении
+result_img = None
+# Декодированная исходная страница (путь, массив RGB, хэш) для inpainting без повторного декодирования
+original_page = None
+
+# Кэш результатов inpainting и история правок
+inpaint_cache = InpaintCache(cache_dir=".inpaint_cache")
+edit_history = EditHistory()
+
 current_theme = "sandstone"
 
 def switch_theme():
@@ -59,6 +72,8 @@ def lock_widgets():
     remove_button.config(state=DISABLED)
     checkbox_text.config(state=DISABLED)
     checkbox_sound.config(state=DISABLED)
+    undo_button.config(state=DISABLED)
+    redo_button.config(state=DISABLED)
     print("Виджеты заблокированы")
 
 def unlock_widgets():
@@ -73,6 +88,8 @@ def unlock_widgets():
     remove_button.config(state=NORMAL if img_preview_path else DISABLED)
     checkbox_text.config(state=NORMAL)
     checkbox_sound.config(state=NORMAL)
+    undo_button.config(state=NORMAL if edit_history.can_undo() else DISABLED)
+    redo_button.config(state=NORMAL if edit_history.can_redo() else DISABLED)
     print("Виджеты разблокированы")
 
 def show_loading_indicator():
@@ -94,13 +111,14 @@ def load_photo():
     """
     Загружает изображение, выбранное пользователем, и начинает процесс генерации масок.
     """
-    global filepath, mask_sound, mask_text, original_img
+    global filepath, mask_sound, mask_text, original_img, original_page
     filepath = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg;*.jpeg;*.png")])
     if filepath:
         print(f"Выбранный файл: {filepath}")
+        edit_history.reset()
+        original_page = None
         lock_widgets()
         show_loading_indicator()
-        original_img = Image.open(filepath)
         thread = threading.Thread(target=generate_masks_and_update_preview, args=(filepath,))
         thread.start()
 
@@ -108,8 +126,13 @@ def generate_masks_and_update_preview(image_path):
     """
     Генерирует начальные маски для изображения и обновляет предпросмотр.
     """
-    global mask_sound, mask_text
-    show_processing_image()
+    global mask_sound, mask_text, original_img
+    # Сначала показываем размытую уменьшенную копию, затем выполняем полное декодирование.
+    # Для PNG уменьшенная копия тоже требует полного декодирования, поэтому это делается не в главном потоке
+    original_img = show_processing_image(image_path)
+    full_img = Image.open(image_path)
+    full_img.load()
+    original_img = full_img
     mask_sound, mask_text = generate_initial_masks(image_path)
     options = get_selected_options()
     if options:
@@ -141,13 +164,17 @@ def get_selected_options():
         options.append("sound")
     return options
 
-def show_processing_image():
+def show_processing_image(image_path):
     """
     Отображает изображение с эффектом размытия для индикации процесса обработки.
+    Размывается уменьшенная копия размером с холст; для JPEG время отображения почти не зависит от размера страницы.
     """
-    if original_img:
-        img_blurred = original_img.filter(ImageFilter.GaussianBlur(15))
-        update_canvas_image(img_blurred, is_blurred=True)
+    max_size = (preview_canvas.winfo_width(), preview_canvas.winfo_height())
+    img_preview, full_size = load_preview_image(image_path, max_size)
+    # Радиус размытия масштабируется, чтобы эффект совпадал с размытием полноразмерного изображения
+    radius = max(1, 15 * img_preview.width / full_size[0])
+    update_canvas_image(img_preview.filter(ImageFilter.GaussianBlur(radius)), is_blurred=True)
+    return img_preview
 
 
 def update_canvas_image(img, is_blurred=False):
@@ -185,9 +212,10 @@ def update_preview(image_path):
     """
     Обновляет предпросмотр изображения на основе предоставленного пути к изображению.
     """
-    global img_preview_path
+    global img_preview_path, result_img
     if image_path:
         img_preview_path = image_path
+        result_img = None
         img = Image.open(image_path)
         update_canvas_image(img)
         print(f"Предпросмотр обновлен с изображением: {image_path}")
@@ -197,6 +225,46 @@ def update_preview(image_path):
         save_button.config(state=DISABLED)
         remove_button.config(state=DISABLED)
 
+def show_result_image(img):
+    """
+    Обновляет предпросмотр результатом inpainting из памяти без записи и повторного чтения файла.
+    """
+    global img_preview_path, result_img
+    result_img = img
+    img_preview_path = "inpainted.png"
+    update_canvas_image(img)
+    print("Предпросмотр обновлен результатом inpainting")
+    save_button.config(state=NORMAL)
+    remove_button.config(state=NORMAL)
+
+def get_preview_image():
+    """
+    Возвращает текущее изображение предпросмотра: результат inpainting из памяти или файл.
+    """
+    if result_img is not None:
+        return result_img
+    return Image.open(img_preview_path)
+
+def flush_result_image():
+    """
+    Записывает результат inpainting из памяти в файл img_preview_path.
+    """
+    global result_img
+    if result_img is not None:
+        result_img.save(img_preview_path)
+        print(f"Результат инпейнтинга сохранен в {img_preview_path}")
+        result_img = None
+
+def get_original_page(image_path):
+    """
+    Возвращает массив RGB и хэш исходной страницы, декодируя файл только один раз.
+    """
+    global original_page
+    if original_page is None or original_page[0] != image_path:
+        img_np = np.array(Image.open(image_path).convert('RGB'))
+        original_page = (image_path, img_np, inpaint_cache.page_hash(image_path, img_np))
+    return original_page[1], original_page[2]
+
 def save_image():
     """
     Сохраняет текущее изображение предпросмотра в файл, выбранный пользователем.
@@ -207,6 +275,7 @@ def save_image():
                                                             ("JPEG files", "*.jpg;*.jpeg"),
                                                             ("All files", "*.*")])
         if save_path:
+            flush_result_image()
             Image.open(img_preview_path).save(save_path)
             messagebox.showinfo("Информация", f"Изображение сохранено в {save_path}")
 
@@ -268,15 +337,63 @@ def remove_mask_and_update_preview(filepath, combined_mask):
     """
     Удаляет маски с изображения и обновляет предпросмотр конечного результата.
     """
-    global img_preview_path
     # Показываем размытую картинку с нанесенными масками во время работы ламы
-    img_with_masks = Image.open(img_preview_path).filter(ImageFilter.GaussianBlur(15))
+    img_with_masks = get_preview_image().filter(ImageFilter.GaussianBlur(15))
     update_canvas_image(img_with_masks, is_blurred=True)
-    # Запуск ламы для удаления масок
-    result_image_path = remove_mask_with_lama(filepath, combined_mask)
-    img_preview_path = result_image_path  # Сохраняем путь к результату inpainting
+    # Запуск ламы для удаления масок (повторные запросы берутся из кэша)
+    img_np, page_hash = get_original_page(filepath)
+    result = inpaint_with_lama(img_np, combined_mask, cache=inpaint_cache, page_hash=page_hash)
+    edit_history.push(combined_mask)
     # Обновляем предпросмотр с конечным результатом
-    update_preview(result_image_path)
+    show_result_image(result)
+    unlock_widgets()
+    hide_loading_indicator()
+
+def undo_edit(event=None):
+    """
+    Отменяет последнее удаление масок.
+    """
+    if not is_processing and filepath and edit_history.can_undo():
+        start_history_restore(edit_history.undo())
+
+def redo_edit(event=None):
+    """
+    Повторяет отмененное удаление масок.
+    """
+    if not is_processing and filepath and edit_history.can_redo():
+        start_history_restore(edit_history.redo())
+
+def start_history_restore(mask):
+    """
+    Запускает восстановление состояния из истории правок в отдельном потоке.
+    """
+    lock_widgets()
+    show_loading_indicator()
+    thread = threading.Thread(target=restore_history_state, args=(filepath, mask))
+    thread.start()
+
+def restore_history_state(filepath, mask):
+    """
+    Восстанавливает состояние страницы из истории правок и обновляет предпросмотр.
+    Результат inpainting берется из кэша, LaMa запускается только при промахе кэша.
+    """
+    global combined_mask_global, img_preview_path, result_img
+    if mask is None:
+        # Состояние до удаления масок: показываем маски на оригинальном изображении
+        options = get_selected_options()
+        if options:
+            apply_masks_and_update_preview(filepath, options)
+            return
+        # Маски не выбраны: на экране и при сохранении - оригинальное изображение
+        img_preview_path = filepath
+        result_img = None
+        combined_mask_global = None
+        update_canvas_image(original_img)
+    else:
+        # Исходная страница уже декодирована, результат из кэша сразу показывается из памяти
+        combined_mask_global = mask
+        img_np, page_hash = get_original_page(filepath)
+        show_result_image(inpaint_with_lama(img_np, mask, cache=inpaint_cache, page_hash=page_hash))
     unlock_widgets()
     hide_loading_indicator()
 
@@ -330,6 +447,12 @@ checkbox_sound.grid(row=0, column=1, padx=2, pady=2)
 remove_button = ttk.Button(frame_options, text="Remove", command=remove_mask, state=DISABLED)
 remove_button.grid(row=1, column=0, columnspan=2, padx=2, pady=5)
 
+# Кнопки отмены и повтора удаления масок
+undo_button = ttk.Button(frame_options, text="Undo", command=undo_edit, state=DISABLED)
+undo_button.grid(row=2, column=0, padx=2, pady=2)
+redo_button = ttk.Button(frame_options, text="Redo", command=redo_edit, state=DISABLED)
+redo_button.grid(row=2, column=1, padx=2, pady=2)
+
 # Создаем рамку для предпросмотра изображения
 frame_preview = ttk.Labelframe(window, text="Image Preview", padding=(5, 5))
 frame_preview.pack(fill=BOTH, expand=True, padx=5, pady=5)
@@ -348,7 +471,7 @@ def on_resize(event):
     Обрабатывает изменение размера окна и обновляет изображение на холсте предпросмотра.
     """
     if img_preview_path:
-        img = Image.open(img_preview_path)
+        img = get_preview_image()
 
         # Проверка состояния чекбоксов
         if any([text_var.get(), sound_var.get()]):
@@ -363,6 +486,10 @@ def on_resize(event):
 # Привязка события изменения размера окна
 window.bind("<Configure>", on_resize)
 
+# Горячие клавиши для отмены и повтора
+window.bind("<Control-z>", undo_edit)
+window.bind("<Control-y>", redo_edit)
+
 # Учет начальных состояний чекбоксов
 on_checkbox_changed()
 
@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+
+from edit_history import Delta, EditHistory, InpaintCache, hash_array, make_delta
+
+
+def make_page(h=64, w=80):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+
+def make_result(page):
+    mask = np.zeros(page.shape[:2], dtype=np.uint8)
+    mask[5:15, 10:30] = 255
+    mask[40:50, 50:70] = 255
+    result = page.copy()
+    result[mask > 0] = [10, 20, 30]
+    # Небольшие отличия вне маски не должны попадать в дельту
+    result[0, 0] = page[0, 0] ^ 1
+    return mask, result
+
+
+def test_delta_round_trip_restores_masked_result():
+    page = make_page()
+    mask, result = make_result(page)
+
+    delta = make_delta(page, result, mask)
+    restored = delta.apply(page)
+
+    assert np.array_equal(restored[mask > 0], result[mask > 0])
+    assert np.array_equal(restored[mask == 0], page[mask == 0])
+    assert sorted(delta.boxes) == [(10, 5, 20, 10), (50, 40, 20, 10)]
+    assert delta.nbytes < page.nbytes
+
+
+def test_delta_save_and_load(tmp_path):
+    page = make_page()
+    mask, result = make_result(page)
+    delta = make_delta(page, result, mask)
+
+    path = str(tmp_path / "delta.npz")
+    delta.save(path)
+    loaded = Delta.load(path)
+
+    assert loaded.boxes == delta.boxes
+    assert np.array_equal(loaded.apply(page), delta.apply(page))
+
+
+def test_delta_without_changes_is_empty():
+    page = make_page()
+    delta = make_delta(page, page.copy())
+
+    assert delta.boxes == []
+    assert np.array_equal(delta.apply(page), page)
+
+
+def make_deltas(count):
+    page = make_page()
+    deltas = []
+    for i in range(count):
+        mask = np.zeros(page.shape[:2], dtype=np.uint8)
+        mask[i:i + 20, i:i + 20] = 255
+        result = page.copy()
+        result[mask > 0] = i
+        deltas.append(((hash_array(page), hash_array(mask)), make_delta(page, result, mask)))
+    return page, deltas
+
+
+def test_cache_spills_to_disk_and_reloads(tmp_path):
+    page, deltas = make_deltas(3)
+    budget = deltas[0][1].nbytes + 1
+    cache = InpaintCache(memory_budget=budget, disk_budget=10 ** 9, cache_dir=str(tmp_path))
+
+    for key, delta in deltas:
+        cache.put(key, delta)
+
+    assert len(os.listdir(tmp_path)) == 2
+    first_key, first_delta = deltas[0]
+    assert np.array_equal(cache.get(first_key).apply(page), first_delta.apply(page))
+
+    # Новый экземпляр кэша находит дельты, сохраненные на диске
+    reopened = InpaintCache(cache_dir=str(tmp_path))
+    on_disk = [key for key, _ in deltas if os.path.exists(reopened._disk_path(key))]
+    assert on_disk
+    assert reopened.get(on_disk[0]) is not None
+
+
+def test_cache_trims_disk_to_budget(tmp_path):
+    _, deltas = make_deltas(4)
+    probe = str(tmp_path / "probe.npz")
+    deltas[0][1].save(probe)
+    file_size = os.path.getsize(probe)
+    os.remove(probe)
+    cache_dir = tmp_path / "cache"
+    cache = InpaintCache(memory_budget=1, disk_budget=int(file_size * 1.5), cache_dir=str(cache_dir))
+
+    for key, delta in deltas:
+        cache.put(key, delta)
+
+    # В памяти остается последняя дельта, на диске - только одна из вытесненных
+    assert cache._disk_size <= cache.disk_budget
+    assert len(os.listdir(cache_dir)) == 1
+    assert cache.get(deltas[0][0]) is None
+    assert cache.get(deltas[2][0]) is not None
+    assert cache.get(deltas[3][0]) is not None
+
+
+def test_cache_without_dir_drops_evicted_entries():
+    _, deltas = make_deltas(2)
+    cache = InpaintCache(memory_budget=deltas[0][1].nbytes + 1)
+
+    for key, delta in deltas:
+        cache.put(key, delta)
+
+    assert cache.get(deltas[0][0]) is None
+    assert cache.get(deltas[1][0]) is not None
+
+
+def test_history_undo_redo_and_duplicates():
+    history = EditHistory()
+    first = np.zeros((4, 4), dtype=np.uint8)
+    second = first.copy()
+    second[1, 1] = 255
+
+    assert history.push(first)
+    assert not history.push(first.copy())
+    assert history.push(second)
+
+    assert np.array_equal(history.undo(), first)
+    assert history.undo() is None
+    assert not history.can_undo()
+    assert np.array_equal(history.redo(), first)
+    assert np.array_equal(history.redo(), second)
+    assert not history.can_redo()
+
+
+def test_history_push_discards_redo_entries():
+    history = EditHistory()
+    first = np.zeros((4, 4), dtype=np.uint8)
+    second = np.full((4, 4), 255, dtype=np.uint8)
+
+    history.push(first)
+    history.undo()
+    history.push(second)
+
+    assert not history.can_redo()
+    assert history.undo() is None
+    assert not history.can_undo()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+
+from hot_folder import HotFolder, MANIFEST_NAME
+
+
+class Pipeline:
+    """
+    Заглушки детекции и инпейнтинга, которые записывают файлы-результаты без загрузки моделей.
+    """
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.detected = []
+
+    def detect(self, image_path, masks_path):
+        name = os.path.basename(image_path)
+        self.detected.append(name)
+        if name in self.fail:
+            raise ValueError(f"не удалось прочитать {name}")
+        with open(masks_path, "wb") as f:
+            f.write(b"masks")
+        mask = np.zeros((4, 4), dtype=np.uint8)
+        mask[1, 1] = 255
+        return mask
+
+    def inpaint(self, image_path, combined_mask, result_path):
+        with open(result_path, "wb") as f:
+            f.write(b"inpainted")
+        return result_path
+
+
+def write(path, data=b"image"):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def run_folder(folder, pipeline, until, timeout=5.0, **kwargs):
+    """
+    Запускает обработчик папки, пока until() не станет истинным, и возвращает его.
+    """
+    hot_folder = HotFolder(str(folder), detect=pipeline.detect, inpaint=pipeline.inpaint,
+                           poll_interval=0.02, settle_time=kwargs.pop("settle_time", 0.05), **kwargs)
+
+    async def main():
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(hot_folder.run(stop_event))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not until(hot_folder) and loop.time() < deadline:
+            await asyncio.sleep(0.02)
+        stop_event.set()
+        await asyncio.wait_for(task, timeout)
+
+    asyncio.run(main())
+    return hot_folder
+
+
+def read_manifest(folder):
+    with open(os.path.join(folder, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_outputs_keep_source_extension(tmp_path):
+    write(tmp_path / "page.jpg")
+    write(tmp_path / "page.png")
+
+    run_folder(tmp_path, Pipeline(), lambda hf: len(hf.manifest) == 2)
+
+    pages = read_manifest(tmp_path)["pages"]
+    assert pages["page.jpg"]["status"] == "done"
+    assert pages["page.jpg"]["masks"] == "page.jpg.masks.png"
+    assert pages["page.png"]["inpainted"] == "page.png.inpainted.png"
+    for name in ("page.jpg.masks.png", "page.jpg.inpainted.png", "page.png.masks.png", "page.png.inpainted.png"):
+        assert (tmp_path / name).exists()
+
+
+def test_changing_file_is_not_queued_until_it_settles(tmp_path):
+    path = tmp_path / "page.png"
+    pipeline = Pipeline()
+    hot_folder = HotFolder(str(tmp_path), detect=pipeline.detect, inpaint=pipeline.inpaint,
+                           poll_interval=0.02, settle_time=0.3)
+
+    async def main():
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(hot_folder.run(stop_event))
+        # Файл дописывается быстрее, чем истекает время ожидания
+        for i in range(10):
+            write(path, b"x" * (i + 1))
+            await asyncio.sleep(0.05)
+        assert pipeline.detected == []
+        assert "page.png" in hot_folder._pending
+        await asyncio.sleep(0.6)
+        stop_event.set()
+        await task
+
+    asyncio.run(main())
+
+    assert pipeline.detected == ["page.png"]
+    assert hot_folder.manifest["page.png"]["signature"][0] == 10
+
+
+def test_restart_skips_unchanged_files(tmp_path):
+    write(tmp_path / "a.png")
+    write(tmp_path / "b.png")
+    run_folder(tmp_path, Pipeline(), lambda hf: len(hf.manifest) == 2)
+
+    write(tmp_path / "b.png", b"changed image")
+    pipeline = Pipeline()
+    run_folder(tmp_path, pipeline, lambda hf: hf.get_stats()["latency"]["total"]["count"] == 1)
+
+    assert pipeline.detected == ["b.png"]
+    assert read_manifest(tmp_path)["pages"]["a.png"]["status"] == "done"
+
+
+def test_errors_are_recorded_and_processing_continues(tmp_path):
+    write(tmp_path / "broken.png")
+    write(tmp_path / "good.png")
+
+    run_folder(tmp_path, Pipeline(fail={"broken.png"}), lambda hf: len(hf.manifest) == 2)
+
+    pages = read_manifest(tmp_path)["pages"]
+    assert pages["broken.png"]["status"] == "error"
+    assert "broken.png" in pages["broken.png"]["error"]
+    assert pages["good.png"]["status"] == "done"
+
+
+def test_manifest_write_failure_does_not_stop_workers(tmp_path):
+    # Каталог на месте манифеста делает запись манифеста невозможной
+    os.mkdir(tmp_path / MANIFEST_NAME)
+    for name in ("a.png", "b.png", "c.png"):
+        write(tmp_path / name)
+
+    hot_folder = run_folder(tmp_path, Pipeline(fail={"b.png"}), lambda hf: len(hf.manifest) == 3,
+                            queue_size=1)
+
+    assert {name: page["status"] for name, page in hot_folder.manifest.items()} == {
+        "a.png": "done", "b.png": "error", "c.png": "done"}
+    stats = hot_folder.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["detect_queue"] == 0 and stats["inpaint_queue"] == 0
+
+
+def test_file_deleted_during_scan_is_skipped(tmp_path, monkeypatch):
+    import hot_folder as hot_folder_module
+
+    write(tmp_path / "gone.png")
+    write(tmp_path / "page.png")
+    real_scandir = os.scandir
+
+    def scandir_then_delete(path):
+        entries = list(real_scandir(path))
+        if (tmp_path / "gone.png").exists():
+            os.remove(tmp_path / "gone.png")
+        return iter(entries)
+
+    monkeypatch.setattr(hot_folder_module.os, "scandir", scandir_then_delete)
+    hot_folder = run_folder(tmp_path, Pipeline(), lambda hf: "page.png" in hf.manifest)
+
+    assert hot_folder.manifest["page.png"]["status"] == "done"
+    assert "gone.png" not in hot_folder.manifest
+    assert "gone.png" not in hot_folder._pending
+
+
+def test_failed_scan_is_retried(tmp_path, monkeypatch):
+    import hot_folder as hot_folder_module
+
+    write(tmp_path / "page.png")
+    real_scandir = os.scandir
+    failures = []
+
+    def flaky_scandir(path):
+        if len(failures) < 3:
+            failures.append(path)
+            raise OSError("папка недоступна")
+        return real_scandir(path)
+
+    monkeypatch.setattr(hot_folder_module.os, "scandir", flaky_scandir)
+    hot_folder = run_folder(tmp_path, Pipeline(), lambda hf: "page.png" in hf.manifest)
+
+    assert len(failures) == 3
+    assert hot_folder.manifest["page.png"]["status"] == "done"
@@ -0,0 +1,54 @@
+from PIL import Image, JpegImagePlugin
+
+from image_preview import load_preview_image
+
+
+def test_jpeg_preview_is_decoded_at_reduced_size(tmp_path, monkeypatch):
+    path = str(tmp_path / "page.jpg")
+    Image.new("RGB", (2400, 1600), (200, 100, 50)).save(path, quality=90)
+    drafts = []
+    real_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def record_draft(self, mode, size):
+        result = real_draft(self, mode, size)
+        drafts.append(self.size)
+        return result
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", record_draft)
+    preview, full_size = load_preview_image(path, (300, 300))
+
+    assert full_size == (2400, 1600)
+    assert preview.size == (300, 200)
+    # Декодер JPEG сразу уменьшил изображение, а не декодировал его целиком
+    assert drafts and drafts[0][0] <= 600
+
+
+def test_png_preview_is_reduced(tmp_path):
+    path = str(tmp_path / "page.png")
+    Image.new("RGBA", (1000, 2000), (10, 20, 30, 255)).save(path)
+
+    preview, full_size = load_preview_image(path, (100, 100))
+
+    assert full_size == (1000, 2000)
+    assert preview.size == (50, 100)
+    assert preview.mode == "RGBA"
+
+
+def test_palette_png_is_converted(tmp_path):
+    path = str(tmp_path / "page.png")
+    Image.new("P", (400, 400), 3).save(path)
+
+    preview, _ = load_preview_image(path, (100, 100))
+
+    assert preview.mode == "RGB"
+    assert preview.size == (100, 100)
+
+
+def test_small_image_is_not_enlarged(tmp_path):
+    path = str(tmp_path / "page.png")
+    Image.new("L", (50, 40)).save(path)
+
+    preview, full_size = load_preview_image(path, (0, 0))
+
+    assert full_size == (50, 40)
+    assert preview.width <= 50 and preview.height <= 40